@@ -1,12 +1,15 @@
 import os
 import httplib
+import urllib
 import logging
-import boto3
+import socket
 import time
-from cStringIO import StringIO
+import zlib
+from io import BytesIO
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+logInfo = logger.info
 
 contract = os.environ['CONTRACT']
 apiKey = os.environ['API_KEY']
@@ -14,37 +17,85 @@ bucketName = os.environ['BUCKET_NAME']
 keyId = os.environ['KEY_ID']
 keySecret = os.environ['KEY_SECRET']
 
-s3 = boto3.client('s3',
-        aws_access_key_id=keyId,
-        aws_secret_access_key=keySecret)
+s3 = None
 
-headers = {'Content-type': 'application/json'}
+headers = {'Content-type': 'application/json', 'Accept-Encoding': 'gzip'}
+
+requestPath = '/vls/v1/stations?contract={}&apiKey={}'.format(
+        urllib.quote(contract), urllib.quote(apiKey))
+
+filenamePrefix = contract + '-'
 
 connection = httplib.HTTPSConnection('api.jcdecaux.com')
 
 def lambda_handler(event, context):
     
-    connection.request('GET', '/vls/v1/stations?contract=' + contract + '&apiKey=' + apiKey, '', headers)
-   
-    response = connection.getresponse()
-    logger.info('Downloaded ' + contract + ' stations : {} '.format(response.status))
+    # scheduled keep-warm ping: return before touching JCDecaux or S3
+    if isinstance(event, dict) and event.get('warmer'):
+        return 'warm'
+
+    response = fetchStations()
+    logInfo('Downloaded %s stations : %s', contract, response.status)
     
     if response.status == 200:
-        result = response.read().decode()
-        uploadToS3(result)
+        uploadToS3(response)
         return 'ok'
-            
+
+    # drain the body so the kept-alive connection can be reused next invoke
+    response.read()
     return 'ko'
 
 
-def uploadToS3(content):
+def fetchStations():
+    try:
+        connection.request('GET', requestPath, '', headers)
+        return connection.getresponse()
+    except (httplib.HTTPException, socket.error):
+        # the server closed the idle kept-alive socket between invokes:
+        # reopen it and retry once
+        connection.close()
+        connection.request('GET', requestPath, '', headers)
+        return connection.getresponse()
+
+
+def getS3Client():
+    # boto3 is only imported on the first upload, keeping it off the
+    # cold start of invocations that never reach S3
+    global s3
+    if s3 is None:
+        import boto3
+        from botocore.config import Config
+        # fail fast instead of letting an S3 blip eat the whole invocation
+        config = Config(connect_timeout=2, read_timeout=5,
+                retries={'max_attempts': 2})
+        s3 = boto3.client('s3',
+                aws_access_key_id=keyId,
+                aws_secret_access_key=keySecret,
+                config=config)
+    return s3
+
+
+def gzipContent(content):
+    # level 1 is several times faster than the default for a slightly
+    # worse ratio, which JSON more than makes up for
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+def uploadToS3(response):
     
-    timestr = time.strftime("%Y%m%d-%H%M%S")
-    filename = contract + '-' + timestr + '.json'
+    timestr = '%04d%02d%02d-%02d%02d%02d' % time.gmtime()[:6]
+    filename = filenamePrefix + timestr + '.json.gz'
     
-    fake_handle = StringIO(content)
-    # notice if you do fake_handle.read() it reads like a file handle
-    s3.put_object(Bucket=bucketName, Key=filename, Body=fake_handle.read())
+    if response.getheader('Content-Encoding') == 'gzip':
+        # already compressed by JCDecaux: read in chunks straight from the
+        # socket, so the payload is never held in memory as a whole
+        body = response
+    else:
+        body = BytesIO(gzipContent(response.read()))
+
+    getS3Client().upload_fileobj(body, bucketName, filename,
+            ExtraArgs={'ContentType': 'application/json', 'ContentEncoding': 'gzip'})
 
-    logger.info(filename + 'uploaded to s3')
+    logInfo('%s uploaded to s3', filename)
     
\ No newline at end of file